@@ -23,6 +23,9 @@ default_le = 999999
 start_angle = None
 end_angle = None
 persist_uid_line = None
+update_period = 5.0  # Seconds between two CoT updates
+cot_time_format = '%Y-%m-%dT%H:%M:%S.995Z'  # Timestamp format of the CoT events
+cot_stale_period = datetime.timedelta(seconds=75)  # CoT events go stale this long after they are sent
 
 # Function to query kraken Server
 def url(_kraken_server):
@@ -43,29 +46,37 @@ def calculate_second_point(lat1, lon1, bearing, distance):
     return lat2, lon2
 
 # Function to send CoT XML payload over UDP
-def send_cot_payload(cot_xml_payload):
+def send_cot_payload(udp_socket, cot_xml_payload):
     try:
-        with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as udp_socket:
-            udp_socket.sendto(cot_xml_payload.encode(), (tak_server_ip, int(tak_server_port)))
-            logging.info(f"CoT XML Payload sent successfully to {tak_server_ip}:{tak_server_port}")
+        udp_socket.sendto(cot_xml_payload.encode(), (tak_server_ip, int(tak_server_port)))
+        logging.info(f"CoT XML Payload sent successfully to {tak_server_ip}:{tak_server_port}")
     except socket.error as e:
         logging.error(f"Socket error: takServerIp: {tak_server_ip}")
         logging.error(f"Socket error: takServerPort: {tak_server_port}")
         logging.error(f"Socket error: {e}")
 
 # Function to send CoT XML payload to multicast endpoint
-def send_to_multicast(cot_xml_payload_multicast):
+def send_to_multicast(udp_socket, cot_xml_payload_multicast):
     try:
-        with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as udp_socket:
-            udp_socket.sendto(cot_xml_payload_multicast.encode(), ('239.2.3.1', 6969))
-            logging.info(f"CoT XML Payload sent to multicast endpoint 239.2.3.1:6969")
+        udp_socket.sendto(cot_xml_payload_multicast.encode(), ('239.2.3.1', 6969))
+        logging.info(f"CoT XML Payload sent to multicast endpoint 239.2.3.1:6969")
     except socket.error as e:
         logging.error(f"Socket error: {e}")
 
 import requests  # Import requests module
 
+# Function to fetch the comma separated DoA values from the Kraken server
+def fetch_kraken_data():
+    try:
+        # Bound the request by the update period, a stalled Kraken server must not hang the update loop
+        kraken_response = requests.get(url(kraken_server), timeout=update_period)
+        return kraken_response.text.split(',')
+    except requests.RequestException as e:
+        logging.error(f"HTTP Request error: {e}")
+        return None
+
 # Function to get GPS data
-def get_gps_data():
+def get_gps_data(kraken_data_parts):
     try:
         gpsd.connect()
         packet = gpsd.get_current()
@@ -82,14 +93,9 @@ def get_gps_data():
 
     # If GPSD is not available or encountered an error, use alternate source (if available)
     try:
-        # Fetch data from Kraken server
-        kraken_response = requests.get(url(kraken_server))
-        kraken_data = kraken_response.text
-
-        # Split the data and extract latitude and longitude
-        data_parts = kraken_data.split(',')
-        latitude_kraken = float(data_parts[8])
-        longitude_kraken = float(data_parts[9])
+        # Extract latitude and longitude from the already fetched Kraken server data
+        latitude_kraken = float(kraken_data_parts[8])
+        longitude_kraken = float(kraken_data_parts[9])
         
         # If alternate source data is available, return it
         return latitude_kraken, longitude_kraken
@@ -103,11 +109,14 @@ def get_gps_data():
 
 # Function to create CoT XML payload for point feature
 def create_cot_xml_payload_point(latitude, longitude, callsign, endpoint, phone, uid, group_name, group_role, geopointsrc, altsrc, battery, device, platform, os, version, speed, course):
+    # Read the clock once, time and start of the event are the same instant
+    now = datetime.datetime.utcnow()
+    timestamp = now.strftime(cot_time_format)
     return f'''<?xml version="1.0"?>
     <event version="2.0" uid="{kraken_station}-{uid}" type="a-f-G-U-C"
-    time="{datetime.datetime.utcnow().strftime('%Y-%m-%dT%H:%M:%S.995Z')}"
-    start="{datetime.datetime.utcnow().strftime('%Y-%m-%dT%H:%M:%S.995Z')}"
-    stale="{(datetime.datetime.utcnow() + datetime.timedelta(seconds=75)).strftime('%Y-%m-%dT%H:%M:%S.995Z')}"
+    time="{timestamp}"
+    start="{timestamp}"
+    stale="{(now + cot_stale_period).strftime(cot_time_format)}"
     how="m-g">
         <point lat="{latitude}" lon="{longitude}" hae="999999" ce="35.0" le="999999" />
         <detail>
@@ -125,10 +134,13 @@ def create_cot_xml_payload_point(latitude, longitude, callsign, endpoint, phone,
 
 # Function to create CoT XML payload for line feature
 def create_cot_xml_payload_line(latitude_kraken, longitude_kraken, second_point, uid_line):
+    # Read the clock once, time and start of the event are the same instant
+    now = datetime.datetime.utcnow()
+    timestamp = now.strftime(cot_time_format)
     return f"""<?xml version='1.0' encoding='utf-8' standalone='yes'?>
-        <event version='2.0' uid='{uid_line}' type='u-d-f' time='{datetime.datetime.utcnow().strftime('%Y-%m-%dT%H:%M:%S.995Z')}'
-        start='{datetime.datetime.utcnow().strftime('%Y-%m-%dT%H:%M:%S.995Z')}'
-        stale='{(datetime.datetime.utcnow() + datetime.timedelta(seconds=75)).strftime('%Y-%m-%dT%H:%M:%S.995Z')}' how='h-e'>
+        <event version='2.0' uid='{uid_line}' type='u-d-f' time='{timestamp}'
+        start='{timestamp}'
+        stale='{(now + cot_stale_period).strftime(cot_time_format)}' how='h-e'>
             <point lat='{latitude_kraken}' lon='{longitude_kraken}' hae='999999' ce='35.0' le='999999'/>
             <point lat='{second_point[0]}' lon='{second_point[1]}' hae='999999' ce='35.0' le='999999'/>
             <detail>
@@ -232,87 +244,98 @@ if __name__ == "__main__":
     flask_thread = Thread(target=run_flask)
     flask_thread.start()
 
-    while True:
-        logging.info('Kraken server:' + kraken_server)
-        logging.info('Tak Server:' + tak_server_ip + ':' + tak_server_port)       
-        logging.info('Tak Multicast:' + str(tak_multicast_state))
+    # A single UDP socket is reused for every unicast and multicast CoT message
+    with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as udp_socket:
+        # Updates are scheduled against monotonic deadlines so the time spent on GPS and HTTP queries does not add to the period
+        next_update = time.monotonic()
+        while True:
+            next_update += update_period
+            logging.info('Kraken server:' + kraken_server)
+            logging.info('Tak Server:' + tak_server_ip + ':' + tak_server_port)       
+            logging.info('Tak Multicast:' + str(tak_multicast_state))
         
-        # Get GPS data
-        latitude, longitude = get_gps_data()
-
-        if latitude is not None and longitude is not None:
-            # Point feature
-            callsign_point = "Kraken Spot"
-            endpoint_point = ""
-            phone_point = ""
-            uid_point = f"{kraken_station}-SignalMedic"
-            group_name_point = "Yellow"
-            group_role_point = "Team Member"
-            geopointsrc_point = "GPS"
-            altsrc_point = ""
-            battery_point = ""
-            device_point = ""
-            platform_point = ""
-            os_point = ""
-            version_point = ""
-            speed_point = "0.00000000"
-            course_point = ""
+            # The Kraken server is queried once per update, both the GPS fallback and the line feature use its data
+            kraken_data_parts = fetch_kraken_data()
+
+            # Get GPS data
+            latitude, longitude = get_gps_data(kraken_data_parts)
+
+            if latitude is not None and longitude is not None:
+                # Point feature
+                callsign_point = "Kraken Spot"
+                endpoint_point = ""
+                phone_point = ""
+                uid_point = f"{kraken_station}-SignalMedic"
+                group_name_point = "Yellow"
+                group_role_point = "Team Member"
+                geopointsrc_point = "GPS"
+                altsrc_point = ""
+                battery_point = ""
+                device_point = ""
+                platform_point = ""
+                os_point = ""
+                version_point = ""
+                speed_point = "0.00000000"
+                course_point = ""
             
-            cot_xml_payload_point = create_cot_xml_payload_point(
-                latitude, longitude, callsign_point, endpoint_point, phone_point, uid_point,
-                group_name_point, group_role_point, geopointsrc_point,
-                altsrc_point, battery_point, device_point, platform_point,
-                os_point, version_point, speed_point, course_point
-            )
-
-
-            send_cot_payload(cot_xml_payload_point)
-            # Send to Multicast endpoint if takMulticast is True
-            if tak_multicast_state:
-                send_to_multicast(cot_xml_payload_point)
-
-            # Line feature
-            try:
-                kraken_response = requests.get(url(kraken_server))
-                kraken_data = kraken_response.text
-
-                data_parts = kraken_data.split(',')
-                latitude_kraken = float(data_parts[8])
-                longitude_kraken = float(data_parts[9])
-                max_doa_angle = float(data_parts[1])
-
-                logging.info(f"max_doa_angle: {max_doa_angle}")
-                logging.info(f"persist_uid_line: {persist_uid_line}")
-                if persist_uid_line is True:
-                    uid_line = generate_uid_line()
-                else:
-                    uid_line = f'{kraken_station}-DOA-to-TAK'
-
-                if start_angle is not None and end_angle is not None:
-                    if evaluate_angle_range(start_angle, end_angle, max_doa_angle):
-                        logging.info("Sending payloads")
-                        second_point = calculate_second_point(latitude_kraken, longitude_kraken, max_doa_angle, 6)
-                        cot_line_payload = create_cot_xml_payload_line(latitude_kraken, longitude_kraken, second_point, uid_line)
-                        send_cot_payload(cot_line_payload)
-                        if tak_multicast_state:
-                            send_to_multicast(cot_line_payload)
+                cot_xml_payload_point = create_cot_xml_payload_point(
+                    latitude, longitude, callsign_point, endpoint_point, phone_point, uid_point,
+                    group_name_point, group_role_point, geopointsrc_point,
+                    altsrc_point, battery_point, device_point, platform_point,
+                    os_point, version_point, speed_point, course_point
+                )
+
+
+                send_cot_payload(udp_socket, cot_xml_payload_point)
+                # Send to Multicast endpoint if takMulticast is True
+                if tak_multicast_state:
+                    send_to_multicast(udp_socket, cot_xml_payload_point)
+
+                # Line feature
+                try:
+                    if kraken_data_parts is None:
+                        raise ValueError("No data from the Kraken server")
+
+                    data_parts = kraken_data_parts
+                    latitude_kraken = float(data_parts[8])
+                    longitude_kraken = float(data_parts[9])
+                    max_doa_angle = float(data_parts[1])
+
+                    logging.info(f"max_doa_angle: {max_doa_angle}")
+                    logging.info(f"persist_uid_line: {persist_uid_line}")
+                    if persist_uid_line is True:
+                        uid_line = generate_uid_line()
+                    else:
+                        uid_line = f'{kraken_station}-DOA-to-TAK'
+
+                    if start_angle is not None and end_angle is not None:
+                        if evaluate_angle_range(start_angle, end_angle, max_doa_angle):
+                            logging.info("Sending payloads")
+                            second_point = calculate_second_point(latitude_kraken, longitude_kraken, max_doa_angle, 6)
+                            cot_line_payload = create_cot_xml_payload_line(latitude_kraken, longitude_kraken, second_point, uid_line)
+                            send_cot_payload(udp_socket, cot_line_payload)
+                            if tak_multicast_state:
+                                send_to_multicast(udp_socket, cot_line_payload)
+                        else:
+                            logging.info("Not sending payloads")
                     else:
-                        logging.info("Not sending payloads")
-                else:
-                    logging.info(f"No DOA Ignore wedge set")
-                    second_point = calculate_second_point(latitude_kraken, longitude_kraken, max_doa_angle, 6)
+                        logging.info(f"No DOA Ignore wedge set")
+                        second_point = calculate_second_point(latitude_kraken, longitude_kraken, max_doa_angle, 6)
                     
-                    cot_line_payload = create_cot_xml_payload_line(latitude_kraken, longitude_kraken, second_point, uid_line)
+                        cot_line_payload = create_cot_xml_payload_line(latitude_kraken, longitude_kraken, second_point, uid_line)
 
-                    send_cot_payload(cot_line_payload)
+                        send_cot_payload(udp_socket, cot_line_payload)
 
-                    # Send to Multicast endpoint if takMulticast is True
-                    if tak_multicast_state:
-                        send_to_multicast(cot_line_payload)
+                        # Send to Multicast endpoint if takMulticast is True
+                        if tak_multicast_state:
+                            send_to_multicast(udp_socket, cot_line_payload)
 
-            except requests.RequestException as e:
-                logging.error(f"HTTP Request error: {e}")
-            except Exception as e:
-                logging.error(f"Error: {e}")
+                except Exception as e:
+                    logging.error(f"Error: {e}")
 
-        time.sleep(5)
\ No newline at end of file
+            sleep_time = next_update - time.monotonic()
+            if sleep_time > 0:
+                time.sleep(sleep_time)
+            else:
+                # Overran the period, restart the schedule instead of bursting to catch up
+                next_update = time.monotonic()
\ No newline at end of file
@@ -25,11 +25,13 @@
 """
 # Import built-in modules
 import logging
+from functools import lru_cache
 from ntpath import join
 import sys
 from struct import pack
 from time import sleep
-from os.path import join
+import os
+from os.path import join, getmtime
 
 # Import third-party modules
 import numpy as np
@@ -52,6 +54,16 @@ import inter_module_messages
 def linear_func(x, a, b):
     return a*x+b
 
+# Fitting mask and masked normalized frequency axis of the fractional delay estimation
+@lru_cache(maxsize=8)
+def get_frac_delay_fit_axis(block_size):
+    freq_scale = np.arange(-0.5,0.5,1/block_size)
+    fit_mask   = np.logical_and(freq_scale < 0.4, freq_scale > -0.4)
+    freq_scale = freq_scale[fit_mask]
+    fit_mask.setflags(write=False)
+    freq_scale.setflags(write=False)
+    return fit_mask, freq_scale
+
 class delaySynchronizer():
     
     def __init__(self):
@@ -85,6 +97,7 @@ class delaySynchronizer():
         self.iq_adjust_amplitude = None
         self.iq_adjust_time = None
         self.iq_adjust_table  = None # Frequency - Phase table for all channels 
+        self.iq_adjust_rf     = None # RF center frequency the current IQ adjustment vector belongs to
 
         self.min_corr_peak_dyn_range = 20 # [dB]
         self.corr_peak_offset = 100 # [sample]
@@ -133,7 +146,8 @@ class delaySynchronizer():
         self.channel_list.remove(self.std_ch_ind)        
         
         # Allocations
-        self.corr_functions = np.zeros((self.M, self.N_proc*2))
+        self.corr_functions = np.zeros((self.M, self.N_proc*2), dtype=np.float32)
+        self.corr_padd = np.zeros((self.M, self.N_proc*2), dtype=np.complex64) # Zero padded correlation inputs, reused across frames
         self.delays = np.zeros(self.M, dtype=int) # Holds the calculated samples delay
         self.iq_corrections = np.ones(self.M, dtype=np.complex64) # This vector holds the IQ compensation values
         self.iq_diff_ref = np.ones(self.M, dtype=np.complex64) # Reference IQ difference vector used in the tracking mode
@@ -197,28 +211,84 @@ class delaySynchronizer():
             iq_adjust_time_str  = iq_adjust_time_str.split(',')[0:self.M-1]
             self.iq_adjust_time = np.array(list(map(float, iq_adjust_time_str)))*10**-9
 
-            iq_adjust_phase     = self.iq_adjust_time*daq_rf*2*np.pi  # Convert time delay to phase         
-
-            self.iq_adjust = self.iq_adjust_amplitude * np.exp(1j*iq_adjust_phase) # Assemble IQ adjustment vector
-            self.iq_adjust = np.insert(self.iq_adjust, self.std_ch_ind, 1+0j)
         elif self.iq_adjust_source == "touchstone":
-            for m in range(self.M):
-                fname = join("_calibration", f"cable_ch{m}.s1p")
-                self.logger.info(f"Loading: {fname}")
-                net = rf.Network(fname)
-                if self.iq_adjust_table is None:
-                    self.iq_adjust_table = np.zeros((len(net.f),self.M+1), dtype=complex)
-                    self.iq_adjust_table[:,0] = net.f[:]
-                self.iq_adjust_table[:,m+1] = net.s[:,0,0]
+            self.iq_adjust_table = self._load_touchstone_table()
             self.logger.info(f"{self.iq_adjust_table.shape}")
-            self.iq_adjust = self.iq_adjust_table[np.argmin(abs(self.iq_adjust_table[:,0]-daq_rf)), 1::]
         
-        self.iq_adjust /= self.iq_adjust[self.std_ch_ind]
+        self._update_iq_adjust(daq_rf)
         self.logger.info(f"IQ adjustment vector: abs:{abs(self.iq_adjust)}")
         self.logger.info(f"IQ adjustment vector: phase:{np.rad2deg(np.angle(self.iq_adjust))}")
          
 
         return 0
+    def _update_iq_adjust(self, daq_rf):
+        """
+            Assembles the IQ adjustment vector for the given RF center frequency.
+
+            The vector only depends on the center frequency, thus it is not recalculated
+            when the calibration is restarted on the same frequency.
+
+            Parameters:
+            -----------
+                :param: daq_rf: RF center frequency [Hz]
+                :type : daq_rf: int
+        """
+        if daq_rf == self.iq_adjust_rf:
+            return
+
+        if self.iq_adjust_source == "explicit-time-delay":
+            iq_adjust_phase  = self.iq_adjust_time*daq_rf*2*np.pi  # Convert time delay to phase         
+
+            iq_adjust = self.iq_adjust_amplitude * np.exp(1j*iq_adjust_phase) # Assemble IQ adjustment vector
+            iq_adjust = np.insert(iq_adjust, self.std_ch_ind, 1+0j)
+        elif self.iq_adjust_source == "touchstone":
+            iq_adjust = self.iq_adjust_table[np.argmin(abs(self.iq_adjust_table[:,0]-daq_rf)),1::]
+        else:
+            iq_adjust = self.iq_adjust
+
+        self.iq_adjust    = iq_adjust / iq_adjust[self.std_ch_ind]
+        self.iq_adjust_rf = daq_rf
+    def _load_touchstone_table(self):
+        """
+            Assembles the frequency - cable response table from the touchstone files of the channels.
+
+            Parsing the .s1p files is slow, thus the assembled table is stored next to them and it
+            is reused as long as it is newer than all of the touchstone files.
+
+            Return values:
+            --------------
+                :return: iq_adjust_table: Frequencies in the first column, S11 of the channels in the others
+                :rtype : iq_adjust_table: Complex 2D numpy array
+        """
+        fnames     = [join("_calibration", f"cable_ch{m}.s1p") for m in range(self.M)]
+        cache_name = join("_calibration", "cable_table.npy")
+        try:
+            if getmtime(cache_name) >= max(map(getmtime, fnames)):
+                # The table is only read from, map it instead of copying it into memory
+                iq_adjust_table = np.load(cache_name, mmap_mode='r')
+                if iq_adjust_table.shape[1] == self.M+1:
+                    self.logger.info(f"Loading: {cache_name}")
+                    return iq_adjust_table
+        except (OSError, ValueError):
+            pass
+
+        iq_adjust_table = None
+        for m, fname in enumerate(fnames):
+            self.logger.info(f"Loading: {fname}")
+            net = rf.Network(fname)
+            if iq_adjust_table is None:
+                iq_adjust_table = np.zeros((len(net.f),self.M+1), dtype=complex)
+                iq_adjust_table[:,0] = net.f[:]
+            iq_adjust_table[:,m+1] = net.s[:,0,0]
+        # Write the cache next to it and swap it in atomically, an interrupted write must not leave a truncated table behind
+        tmp_cache_name = cache_name + ".tmp"
+        try:
+            with open(tmp_cache_name, "wb") as cache_file:
+                np.save(cache_file, iq_adjust_table)
+            os.replace(tmp_cache_name, cache_name)
+        except OSError:
+            self.logger.warning(f"Failed to save touchstone cache: {cache_name}")
+        return iq_adjust_table
     def open_interfaces(self):
         """
             Opens the communication interfaces of the module including the
@@ -272,15 +342,14 @@ class delaySynchronizer():
         if self.in_shmem_iface is not None:
             self.in_shmem_iface.destory_sm_buffer()
                 
-        if self.out_shmem_iface_iq is not None:
-            self.out_shmem_iface_iq.send_ctr_terminate()
-            sleep(2)
-            self.out_shmem_iface_iq.destory_sm_buffer()        
-
-        if self.out_shmem_iface_hwc is not None:
-            self.out_shmem_iface_hwc.send_ctr_terminate()
+        # Signal termination on both outputs first, so that the sinks are given their grace period in parallel
+        out_shmem_ifaces = [iface for iface in (self.out_shmem_iface_iq, self.out_shmem_iface_hwc) if iface is not None]
+        for out_shmem_iface in out_shmem_ifaces:
+            out_shmem_iface.send_ctr_terminate()
+        if out_shmem_ifaces:
             sleep(2)
-            self.out_shmem_iface_hwc.destory_sm_buffer()  
+        for out_shmem_iface in out_shmem_ifaces:
+            out_shmem_iface.destory_sm_buffer()
             
         self.logger.info("Interfaces are closed")
     def calc_iq_sync(self, iq_samples):
@@ -309,19 +378,15 @@ class delaySynchronizer():
                 :rtype : iq_diffs  : Complex 1D numpy array
                 
         """
-        iq_diffs   = np.ones(self.M, dtype=np.complex64)
-        dyn_ranges = []        
-
         # Calculate cross-correlations to check sample level synchrony
-        for m in self.channel_list:
-            # Correlation at zero offset 
-            iq_diffs[m]     = self.N_proc / (np.dot(iq_samples[m, :], 
-                                                  iq_samples[self.std_ch_ind, :].conj()))
-            # Correlation at the spcified offset
-            corr_at_offset_m =  self.N_proc / (np.dot(iq_samples[m, self.corr_peak_offset::],
-                                                   iq_samples[self.std_ch_ind, 0:-self.corr_peak_offset].conj()))
-            # Check dynamic range
-            dyn_ranges.append(-20*np.log10(abs(iq_diffs[m]) / abs(corr_at_offset_m)))
+        # All the channels are correlated against the standard channel at once
+        std_ch = iq_samples[self.std_ch_ind, :].conj()
+        # Correlation at zero offset
+        corr_at_zero   = iq_samples[self.channel_list, :].dot(std_ch)
+        # Correlation at the spcified offset
+        corr_at_offset = iq_samples[self.channel_list, self.corr_peak_offset::].dot(std_ch[0:-self.corr_peak_offset])
+        # Check dynamic range
+        dyn_ranges = 20*np.log10(np.abs(corr_at_zero) / np.abs(corr_at_offset))
 
         # Calculate Spatial correlation matrix to determine amplitude-phase missmatches         
         Rxx = iq_samples.dot(np.conj(iq_samples.T))
@@ -335,21 +400,20 @@ class delaySynchronizer():
 
         # Amplitude correction -  scaling IQ diferences
         if self.amplitude_cal_mode == "channel_power":
-            channel_powers = list(map(lambda ch_ind: np.dot(iq_samples[ch_ind, :], iq_samples[ch_ind, :].conj())/self.N_proc, np.arange(self.M)))
-            iq_diffs       = np.array(list(map(lambda m: iq_diffs[m]/np.abs(iq_diffs[m])*
-                                                         np.sqrt(channel_powers[self.std_ch_ind]/channel_powers[m]),
-                                           np.arange(self.M))))
+            channel_powers = np.einsum('ij,ij->i', iq_samples, iq_samples.conj()).real/self.N_proc
+            iq_diffs       = iq_diffs/np.abs(iq_diffs)*np.sqrt(channel_powers[self.std_ch_ind]/channel_powers)
         elif self.amplitude_cal_mode == "disabled":            
-            iq_diffs        = np.array(list(map(lambda m: iq_diffs[m]/np.abs(iq_diffs[m]), np.arange(self.M))))
+            iq_diffs        = iq_diffs/np.abs(iq_diffs)
     
-            return np.array(dyn_ranges), iq_diffs
+            return dyn_ranges, iq_diffs
 
-        for m in range(self.M):
-            self.logger.debug("Channel: {:d}, Peak dyn. range: {:.2f}[min: {:.2f}], Amp.:{:.2f}, Phase:{:.2f} ".format(\
-                            m, dyn_ranges[-1], self.min_corr_peak_dyn_range, 20*np.log10(abs(iq_diffs[m])), 
-                            np.rad2deg(np.angle(iq_diffs[m]))))  
+        if self.logger.isEnabledFor(logging.DEBUG):
+            for m in range(self.M):
+                self.logger.debug("Channel: {:d}, Peak dyn. range: {:.2f}[min: {:.2f}], Amp.:{:.2f}, Phase:{:.2f} ".format(\
+                                m, dyn_ranges[-1], self.min_corr_peak_dyn_range, 20*np.log10(abs(iq_diffs[m])), 
+                                np.rad2deg(np.angle(iq_diffs[m]))))  
 
-        return np.array(dyn_ranges), iq_diffs
+        return dyn_ranges, iq_diffs
     def estimate_frac_delays(self, iq_samples, block_size=2**10):
         """
             This function estimates the fractional sample delay between the coherent receiver channels
@@ -387,36 +451,28 @@ class delaySynchronizer():
         N = iq_samples.shape[1] # Number of samples
         M = iq_samples.shape[0] # Number of channels
         
-        freq_scale = np.arange(-0.5,0.5,1/block_size)
-        fit_mask   = np.logical_and(freq_scale < 0.4, freq_scale > -0.4)
-            
-        phase_diff_w = np.zeros((M-1,block_size), dtype=np.complex64)
+        fit_mask, freq_scale = get_frac_delay_fit_axis(block_size)
+        N_blocks = N//block_size # Number of coherent blocks
         """
             Processing
         """
+        # Correct fix phase offset
+        phase_shifts_w0 = np.mean(iq_samples[0]*iq_samples[1:M].conj(), axis=1)
+        iq_samples[1:M] *= phase_shifts_w0[:, np.newaxis]
+
         # Estimate phase transfer
-        std_ch_w_block = np.zeros((N//block_size, block_size), dtype=np.complex64)
-        #  - Transform standard channel to frequency domain block-wise
-        for block_index, block_start in enumerate(np.arange(0,N, block_size)):
-            std_ch_w_block[block_index,:] =  fft.fftshift(fft.fft(iq_samples[0, block_start:block_start+block_size], workers=4, overwrite_x=False))
+        #  - Transform all the channels to frequency domain block-wise with a single batched FFT
+        iq_w_blocks = iq_samples[:, 0:N_blocks*block_size].reshape(M, N_blocks, block_size)
+        iq_w_blocks = fft.fftshift(fft.fft(iq_w_blocks, axis=-1, workers=4), axes=-1)
+        #  - Calculate phase transfers with non-coherent integration
+        phase_diff_w = np.mean(iq_w_blocks[0]/iq_w_blocks[1:M], axis=1)
 
         for m in range(M-1):
-            # Correct fix phase offset
-            phase_shift_w0 = np.average(iq_samples[0]*iq_samples[m+1].conj())
-            iq_samples[m+1] *= phase_shift_w0
-            
-            for block_index, block_start in enumerate(np.arange(0,N, block_size)):
-                # Transform current block of the m-th channel to frequency domain
-                corr_ch_w_block  = fft.fftshift(fft.fft(iq_samples[m+1, block_start:block_start+block_size], workers=4, overwrite_x=True))
-                # Calculate phase transfer with non-coherent integration
-                phase_diff_w[m,:] += std_ch_w_block[block_index,:]/corr_ch_w_block
-            phase_diff_w[m,:] /= (N//block_size) # Normalization
-            
             angle_diff_w = np.angle(phase_diff_w[m,:]).real # Convert complex phasor to angle
 
             
                 # Fit linear curve on to the estimated phase transfers and derive fractional delay
-            popt, pcov = curve_fit(linear_func, freq_scale[fit_mask], angle_diff_w[fit_mask])
+            popt, pcov = curve_fit(linear_func, freq_scale, angle_diff_w[fit_mask])
             taus.append(popt[0]/(2*np.pi))    
 
         return taus
@@ -461,10 +517,10 @@ class delaySynchronizer():
             active_buffer_index_iq = self.out_shmem_iface_iq.wait_buff_free()
             active_buffer_index_hwc = self.out_shmem_iface_hwc.wait_buff_free() 
             
-            self.logger.debug("Type:{:d}, CPI: {:d}, State:{:s}".format(
+            self.logger.debug("Type:%d, CPI: %d, State:%s",
                     self.iq_header.frame_type, 
                     self.iq_header.cpi_index, 
-                    self.current_state))
+                    self.current_state)
             #############################################
             #  Delay Synchronizer Finite State Machine  #
             #############################################
@@ -502,18 +558,11 @@ class delaySynchronizer():
                     sync_state = 1
                     # Recalculate IQ adjustment for the RF center frequency
                     daq_rf           = self.iq_header.rf_center_freq # Read RF center frequency for phase offset calculation
-                    if self.iq_adjust_source == "explicit-time-delay":
-                        iq_adjust_phase  = self.iq_adjust_time*daq_rf*2*np.pi  # Convert time delay to phase         
-
-                        self.iq_adjust = self.iq_adjust_amplitude * np.exp(1j*iq_adjust_phase) # Assemble IQ adjustment vector
-                        self.iq_adjust = np.insert(self.iq_adjust, self.std_ch_ind, 1+0j)
-                    elif self.iq_adjust_source == "touchstone":
-                        self.iq_adjust = self.iq_adjust_table[np.argmin(abs(self.iq_adjust_table[:,0]-daq_rf)),1::]
+                    self._update_iq_adjust(daq_rf)
 
+                    if self.iq_adjust_source == "touchstone" and self.logger.isEnabledFor(logging.DEBUG):
                         self.logger.debug(f"IQ adjustment vector: abs:{abs(self.iq_adjust)}")
                         self.logger.debug(f"IQ adjustment vector: phase:{np.rad2deg(np.angle(self.iq_adjust))}")
-                    
-                    self.iq_adjust /= self.iq_adjust[self.std_ch_ind]
                     # Reset IQ corrections
                     self.iq_corrections    = np.ones(self.M, dtype=np.complex64) 
                     self.iq_corrections[:] = self.iq_adjust[:]
@@ -531,18 +580,20 @@ class delaySynchronizer():
                     fs_ppm_offsets=[0]*self.M 
 
                     # ->  Calculate correlation functions            
-                    np_zeros = np.zeros(self.N_proc, dtype=np.complex64)
-                    x_padd = np.concatenate([iq_samples[self.std_ch_ind, 0:self.N_proc], np_zeros])
-                    x_fft = fft.fft(x_padd, workers=4, overwrite_x=True)
+                    # The standard channel is padded at the end, the others at the beginning. Only the
+                    # sample halves of the buffer are rewritten, the padding halves remain zero.
+                    self.corr_padd[self.std_ch_ind, 0:self.N_proc] = iq_samples[self.std_ch_ind, 0:self.N_proc]
+                    self.corr_padd[self.channel_list, self.N_proc::] = iq_samples[self.channel_list, 0:self.N_proc]
+                    corr_padd_fft = fft.fft(self.corr_padd, axis=1, workers=4)
+                    x_fft = corr_padd_fft[self.std_ch_ind, :]
                     
-                    for m in self.channel_list:
-                        y_padd = np.concatenate([np_zeros, iq_samples[m, 0:self.N_proc]])
-                        y_fft = fft.fft(y_padd, workers=4, overwrite_x=True)
-                        self.corr_functions[m,:] = np.abs(fft.ifft(x_fft.conj() * y_fft, workers=4, overwrite_x=True))**2
+                    corr_function = fft.ifft(x_fft.conj() * corr_padd_fft[self.channel_list, :], axis=1, workers=4, overwrite_x=True)
+                    self.corr_functions[self.channel_list, :] = corr_function.real**2 + corr_function.imag**2
                     # ->  Calculate sample delays, check dynamic range
                     # WARNING: This dynamic range checking assumes dirac like coorelation peak                    
+                    peak_indexes = np.argmax(self.corr_functions, axis=1) # Peak search for all the channels at once
                     for m in self.channel_list:
-                        peak_index = np.argmax(self.corr_functions[m, :])
+                        peak_index = peak_indexes[m]
 
                         # Check dynamic range
                         # TODO: Check overindexing
@@ -714,10 +765,11 @@ class delaySynchronizer():
                                (abs(iq_diffs/self.iq_diff_ref) > self.amp_diff_tolerance).any():
                                    iq_sync_flag = False
                                    self.logger.warning("IQ sync may lost")
-                                   for m in range(self.M):
-                                       self.logger.debug("Differences: Amplitude {:.2f}, Phase: {:.2f}".format(
-                                               20*np.log10((abs(iq_diffs[m]/self.iq_diff_ref[m]))), 
-                                               (abs(np.rad2deg(np.angle(iq_diffs[m]/self.iq_diff_ref[m]))))))
+                                   if self.logger.isEnabledFor(logging.DEBUG):
+                                       for m in range(self.M):
+                                           self.logger.debug("Differences: Amplitude {:.2f}, Phase: {:.2f}".format(
+                                                   20*np.log10((abs(iq_diffs[m]/self.iq_diff_ref[m]))), 
+                                                   (abs(np.rad2deg(np.angle(iq_diffs[m]/self.iq_diff_ref[m]))))))
                             else:
                                 iq_sync_flag = True
 
@@ -747,11 +799,11 @@ class delaySynchronizer():
                         self.current_state = "STATE_INIT"
     
                 # Uncomment it for long term delay compenstation stress!
-                self.logger.info("Delay track statistic [sync fails ,sample, iq, total][{:d},{:d},{:d}/{:d}]".format(
+                self.logger.info("Delay track statistic [sync fails ,sample, iq, total][%d,%d,%d/%d]",
                                  self.sync_failed_cntr_total, 
                                  self.sample_compensation_cntr, 
                                  self.iq_compensation_cntr, 
-                                 self.iq_header.daq_block_index))                                             
+                                 self.iq_header.daq_block_index)                                             
             
             elif (self.iq_header.frame_type == IQHeader.FRAME_TYPE_DUMMY): 
                 # Reset instantaneous sync failed counter (New noise burst will start)
@@ -799,16 +851,17 @@ class delaySynchronizer():
             # -> Inform the preceeding block that we have finished the processing
             self.in_shmem_iface.send_ctr_buff_ready(active_buff_index_dec)
 
-@njit(fastmath=True, cache=True)
+@njit(fastmath=True, cache=True, nogil=True, parallel=True)
 def correct_iq(iq_samples_in, iq_samples_out, iq_corrections, M):
-    for m in range(M):
+    # Channels are corrected independently, process them on separate threads
+    for m in nb.prange(M):
         iq_samples_out[m,:] = (iq_samples_in[m,:]-np.mean(iq_samples_in[m,:]))*iq_corrections[m]
 
     return iq_samples_out
 
-@njit(fastmath=True, cache=True)
+@njit(fastmath=True, cache=True, nogil=True, parallel=True)
 def copy_iq(iq_samples_in, iq_samples_out, M):
-    for m in range(M):
+    for m in nb.prange(M):
         iq_samples_out[m,:] = iq_samples_in[m,:]
 
     return iq_samples_out
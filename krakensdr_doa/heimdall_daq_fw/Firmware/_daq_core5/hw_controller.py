@@ -267,7 +267,7 @@ class HWC():
         gains=[]
         for m in range(self.M):
             gains.append(self.valid_gains[self.gains[m]])
-            self.logger.info("Send Ch {:d} Gain: {:d} [{:d}]".format(m, int(gains[m]), self.iq_header.cpi_index))
+            self.logger.info("Send Ch %d Gain: %d [%d]", m, int(gains[m]), self.iq_header.cpi_index)
         # Send gain list
         msg_byte_array = inter_module_messages.pack_msg_set_gain(self.module_identifier, gains)
         self.rtl_daq_socket.send(msg_byte_array)
@@ -431,7 +431,7 @@ class HWC():
             # if incoming_payload_size > 0:
             	# iq_samples = buffer[1024:1024 + incoming_payload_size].view(dtype=np.complex64).reshape(self.iq_header.active_ant_chs, self.iq_header.cpi_length) [:,0:self.N_proc] 
                 
-            self.logger.debug("Type:{:d}, CPI: {:d}, State:{:s}".format(self.iq_header.frame_type, self.iq_header.cpi_index, self.current_state))
+            self.logger.debug("Type:%d, CPI: %d, State:%s", self.iq_header.frame_type, self.iq_header.cpi_index, self.current_state)
             ##############################################
             #  Hardware Controller Finite State Machine  #
             ##############################################
@@ -442,8 +442,8 @@ class HWC():
                 if self.iq_header.frame_type == IQHeader.FRAME_TYPE_DATA:
                     for m in range(self.M):
                         power = 0 # TODO: Read out from the header
-                        self.logger.debug("Channel {:d} power:{:.2f} dB, gain:{:d} [{:d}]".format(m, power, 
-                                        self.iq_header.if_gains[m], self.iq_header.cpi_index))                                            
+                        self.logger.debug("Channel %d power:%.2f dB, gain:%d [%d]", m, power, 
+                                        self.iq_header.if_gains[m], self.iq_header.cpi_index)                                            
 
                 # -> Chech overdrive per channel
                 for m in range(self.M):
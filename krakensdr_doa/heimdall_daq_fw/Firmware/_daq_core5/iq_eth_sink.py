@@ -98,6 +98,8 @@ class IQRecorder():
         """
             Starts receiving IQ Frames through the IQ data interface
         """
+        # Only wait between the retries, the first connection attempt is made right away
+        self.connect_eth()
         while not self.receiver_connection_status:
             time.sleep(1)
             self.connect_eth()
@@ -1,4 +1,5 @@
 import numpy as np
+from scipy import fft
 import matplotlib.pyplot as plt
 import os
 import logging 
@@ -47,7 +48,6 @@ iq_data_bytes = file_descr.read(iq_data_length)
 file_descr.close()
           
 iq_cf64 = np.frombuffer(iq_data_bytes, dtype=np.complex64).reshape(iq_header.active_ant_chs, iq_header.cpi_length)
-iq_cf64 = iq_cf64.copy()
 
 """
 ---------------------
@@ -57,9 +57,8 @@ iq_cf64 = iq_cf64.copy()
 N = iq_header.cpi_length
 M = iq_header.active_ant_chs
 
-# Remove DC
-for m in range(M):       
-    iq_cf64[m,:] -= np.average(iq_cf64[m,:])
+# Remove DC, the subtraction also produces the writable copy of the read-only frame buffer
+iq_cf64 = iq_cf64 - np.mean(iq_cf64, axis=1, keepdims=True)
 
 if en_td_plot:
     x = iq_cf64[0,:]
@@ -71,12 +70,12 @@ if en_td_plot:
 
 if en_fd_plot:
     plt.figure(2)
-    freqs = np.fft.fftfreq(N, 1/fs)
-    freqs = np.fft.fftshift(freqs) 
+    freqs = fft.fftfreq(N, 1/fs)
+    freqs = fft.fftshift(freqs) 
     freqs /= 10**6
     for m in range(1):
-        xw = np.fft.fft(iq_cf64[m, :])
-        xw = np.fft.fftshift(xw)
+        xw = fft.fft(iq_cf64[m, :], workers=4)
+        xw = fft.fftshift(xw)
         xw = abs(xw)
         xw /= np.max(xw)
         plt.plot(freqs, 20*np.log10(xw))
@@ -87,14 +86,17 @@ if en_xcorr_plot:
     N_proc = 2**16
     np_zeros = np.zeros(N_proc, dtype=np.complex64)
     x_padd = np.concatenate([iq_cf64[std_ch_ind, 0:N_proc], np_zeros])
-    x_fft = np.fft.fft(x_padd)
+    x_fft = fft.fft(x_padd, workers=4)
+    
+    # Cross-correlate all the other channels with a single batched FFT
+    y_padd = np.zeros((M-1, 2*N_proc), dtype=np.complex64)
+    y_padd[:, N_proc::] = iq_cf64[1:M, 0:N_proc]
+    y_fft = fft.fft(y_padd, axis=1, workers=4, overwrite_x=True)
+    corr_functions = fft.ifft(x_fft.conj() * y_fft, axis=1, workers=4, overwrite_x=True)
     
     time_delay_indices = np.arange(0,2*N_proc)-N_proc
     for m in np.arange(1, M,1):        
-        y_padd = np.concatenate([np_zeros, iq_cf64[m, 0:N_proc]])
-        y_fft = np.fft.fft(y_padd)
-        corr_function = np.fft.ifft(x_fft.conj() * y_fft)
-        corr_function = abs(corr_function)
+        corr_function = abs(corr_functions[m-1, :])
         corr_function_log = 20*np.log10(corr_function)
         #corr_function_log -= max(corr_function_log) 
         
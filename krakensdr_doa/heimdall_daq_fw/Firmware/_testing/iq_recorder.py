@@ -118,7 +118,7 @@ class IQRecorder():
                     
             try:
                 self.socket_inst.sendall(str.encode("IQDownload")) # Send iq request command
-                iq_frame_bytes = self.receive_iq_frame()
+                iq_header_bytes, iq_data_bytes = self.receive_iq_frame()
                 
                 self.en_save_iq = False
                 
@@ -162,9 +162,10 @@ class IQRecorder():
                 # Save iq samples
                 if self.en_save_iq:        
                     self.logger.info("Recording,  CPI index: {:d}".format(self.iq_header.cpi_index))
-                    iq_file_descr = open("_testing/"+self.fname_prefix+"_"+str(self.frame_rec_cntr)+".iqf", "wb")
-                    iq_file_descr.write(iq_frame_bytes)
-                    iq_file_descr.close()
+                    with open("_testing/"+self.fname_prefix+"_"+str(self.frame_rec_cntr)+".iqf", "wb") as iq_file_descr:
+                        # Write the received buffers as they are, no need to concatenate them first
+                        iq_file_descr.write(iq_header_bytes)
+                        iq_file_descr.write(iq_data_bytes)
                     self.frame_rec_cntr +=1
                 else:
                     self.logger.info("IQ Frame received and dropped, CPI index: {:d}".format(self.iq_header.cpi_index))
@@ -185,6 +186,11 @@ class IQRecorder():
     def receive_iq_frame(self):
         """
                 Receives IQ samples over Ethernet connection
+
+                Return values:
+                --------------
+                    :return: iq_header_bytes, iq_data_bytes: Received header and IQ data buffers
+                    :rtype : bytearray, bytearray
         """
         
         total_received_bytes = 0
@@ -226,8 +232,7 @@ class IQRecorder():
         
         # Dump IQ header        
         #self.iq_header.dump_header()
-        iq_frame_bytes=bytearray()+iq_header_bytes+iq_data_bytes
-        return iq_frame_bytes
+        return iq_header_bytes, iq_data_bytes
         
 IQ_rec_inst0 = IQRecorder()
 IQ_rec_inst0.start_process()
@@ -28,7 +28,7 @@ import os
 import sys
 import time
 import numpy as np
-from struct import pack, unpack
+from struct import unpack
 from configparser import ConfigParser
 import logging
 from threading import Thread
@@ -251,6 +251,9 @@ FIFO_rd_thread_inst0.start()
 #            Simulation
 ####################################
 
+# Random number generator of the simulated signal and noise components
+rng = np.random.default_rng()
+
 # Allocation
 signal = np.zeros((block_size), dtype=np.uint8) # This array stores the samples that are written to output
 raw_sig_m = np.zeros((block_size//2+max(delays)), dtype = complex)
@@ -270,7 +273,8 @@ try:
         
         if sig_type == "noise":
             std_dev = np.sqrt(sig_pow/2)
-            raw_sig = np.random.normal(0,std_dev,(N_daq))+1j*np.random.normal(0,std_dev,(N_daq))        
+            raw_sig_re_im = rng.normal(0,std_dev,(2,N_daq))
+            raw_sig = raw_sig_re_im[0]+1j*raw_sig_re_im[1]
         elif sig_type == "cw":
             t = np.arange(N_daq) + t_start
             t_start = t[-1]
@@ -312,7 +316,13 @@ try:
 
         # Generate coherent noise for calibration to simulate the internal noise source
         std_dev = np.sqrt(10**(pow_noise_source_dB/10)/2)
-        internal_noise = np.random.normal(0,std_dev,(N_daq+max(delays)))+1j*np.random.normal(0,std_dev,(N_daq+max(delays)))
+        internal_noise_re_im = rng.normal(0,std_dev,(2,N_daq+max(delays)))
+        internal_noise = internal_noise_re_im[0]+1j*internal_noise_re_im[1]
+
+        # Draw the non-coherent noise of all the channels at once
+        std_dev = np.sqrt(10**(pn/10)/2)
+        noise_re_im = rng.normal(0,std_dev,(2,M,N_daq))
+        noise = noise_re_im[0]+1j*noise_re_im[1]
 
         # Arange coherent signal components in multiblock array
         start_index = b%2*(N_daq)
@@ -416,9 +426,7 @@ try:
                              *  np.exp(1j*np.deg2rad(phase_diffs[m]))
             
             # # Corrupt useful signal with additive non-coherent noise 
-            std_dev = np.sqrt(10**(pn/10)/2)
-            noise = np.random.normal(0,std_dev,(N_daq))+1j*np.random.normal(0,std_dev,(N_daq))                       
-            raw_sig_m += noise
+            raw_sig_m += noise[m]
                         
             #######################################
             # Test case [2] -Dummy frame generation
@@ -479,7 +487,6 @@ try:
             
             signal[0::2] = raw_sig_m.real
             signal[1::2] = raw_sig_m.imag      
-            byte_array= pack('B'*block_size, *signal)
             #logger.debug("Data block size: {:d} bytes".format(len(byte_array)))
             #iq_header.encode_header()
             #logger.debug("Header size: {:d}".format(len(iq_header.encode_header())))
@@ -488,7 +495,8 @@ try:
             if m==0:            
                 sys.stdout.buffer.write(iq_header.encode_header()) # Write the IQ header
                 
-            sys.stdout.buffer.write(byte_array) #Write IQ data
+            # The uint8 sample array is written through the buffer protocol as a single block, without repacking
+            sys.stdout.buffer.write(signal) #Write IQ data
 except:
     logging.error("Unexpected error: {:s}".format(sys.exc_info()[0]))
          
@@ -47,22 +47,21 @@ def chk_float(s):
         return False
 
 def count_receivers():
-    lsusb_cmd = subprocess.run(["lsusb"], capture_output=True, text=True)
-    lsusb_str = lsusb_cmd.stdout
+    # Parse the device list line by line as it is streamed, instead of buffering the whole output
     device_count = 0
-    for line in lsusb_str.splitlines():
-        if line.find("Realtek")>=0:device_count+=1
+    with subprocess.Popen(["lsusb"], stdout=subprocess.PIPE, text=True) as lsusb_cmd:
+        for line in lsusb_cmd.stdout:
+            if line.find("Realtek")>=0:device_count+=1
     logging.debug("Found {:d} receivers".format(device_count))
     return device_count
 def get_serials():
     serial_nos = []
     for ch_ind in range(5):
-        rtl_eeprom_cmd = subprocess.run(["rtl_eeprom", "-d", str(ch_ind)], capture_output=True, text=True)
-        response    = rtl_eeprom_cmd.stderr
-        response_l  = response.split('\n')
-        for line in response_l:
-            if line.find("Serial number:") >=0:
-                serial_nos.append(int(line[line.find(':\t\t')+2:]))
+        # rtl_eeprom reports on stderr
+        with subprocess.Popen(["rtl_eeprom", "-d", str(ch_ind)], stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True) as rtl_eeprom_cmd:
+            for line in rtl_eeprom_cmd.stderr:
+                if line.find("Serial number:") >=0:
+                    serial_nos.append(int(line[line.find(':\t\t')+2:]))
     return serial_nos
 
 # Initialize logger
@@ -75,12 +75,22 @@ except ModuleNotFoundError:
     hasgps = False
     print("Can't find gpsd - ok if no external gps used")
 
+# Make orjson an optional component, the status file is written on every frame
+try:
+    import orjson
+
+    hasorjson = True
+except ModuleNotFoundError:
+    hasorjson = False
+
 MIN_SPEED_FOR_VALID_HEADING = 2.0  # m / s
 MIN_DURATION_FOR_VALID_HEADING = 3.0  # s
 DEFAULT_VFO_FIR_ORDER_FACTOR = int(2)
 DEFAULT_ROOT_MUSIC_STD_DEGREES = 1
 
 NEAR_ZERO = 1e-15
+# Formatter of one DoA spectrum bin in the comma separated outputs, bound once instead of parsing the spec per bin
+DOA_VALUE_FMT = ", {:.2f}".format
 
 
 class SignalProcessor(threading.Thread):
@@ -98,6 +108,8 @@ class SignalProcessor(threading.Thread):
         self.root_path = root_path
         doa_res_file_path = os.path.join(shared_path, "DOA_value.html")
         self.DOA_res_fd = open(doa_res_file_path, "w+")
+        self.DOA_xml_file_path = os.path.join(shared_path, "doa.xml")
+        self.status_write_failed = False  # Only the first of consecutive status file write failures is logged
 
         self.module_receiver = module_receiver
         self.data_que = data_que
@@ -141,6 +153,8 @@ class SignalProcessor(threading.Thread):
         self.spectrum_window_size = fft.next_fast_len(4096)
         self.spectrum_plot_size = 1024
         self.spectrum_window = "hann"
+        self._run_processing_event = threading.Event()
+        self._idle_event = threading.Event()
         self.run_processing = True  # False
         self.is_running = False
         self.channel_number = 4  # Update from header
@@ -185,7 +199,7 @@ class SignalProcessor(threading.Thread):
 
         # self.DOA_theta =  np.linspace(0,359,360)
         self.spectrum = None  # np.ones((self.channel_number+2,N), dtype=np.float32)
-        self.peak_hold_spectrum = np.ones(self.spectrum_window_size) * -200
+        self.peak_hold_spectrum = np.full(self.spectrum_window_size, -200, dtype=np.float32)
         self.en_peak_hold = False
 
         self.latency = 100
@@ -247,6 +261,33 @@ class SignalProcessor(threading.Thread):
         # Antenna for Spectrum Data
         self.spectrum_antenna = 2
 
+    # Backed by an Event so that the idle processing thread wakes up as soon as processing is requested
+    @property
+    def run_processing(self):
+        return self._run_processing_event.is_set()
+
+    @run_processing.setter
+    def run_processing(self, value):
+        if value:
+            self._run_processing_event.set()
+        else:
+            self._run_processing_event.clear()
+
+    # Backed by an Event so that stopping the processing does not need to poll the state of the thread
+    @property
+    def is_running(self):
+        return not self._idle_event.is_set()
+
+    @is_running.setter
+    def is_running(self, value):
+        if value:
+            self._idle_event.clear()
+        else:
+            self._idle_event.set()
+
+    def wait_until_idle(self, timeout=None):
+        return self._idle_event.wait(timeout)
+
     @property
     def vfo_demod_modes(self):
         vfo_demod = [self.vfo_default_demod] * self.max_vfos
@@ -265,9 +306,15 @@ class SignalProcessor(threading.Thread):
                 vfo_iq[i] = True if demod == "True" else False
         return vfo_iq
 
+    def reset_spectrum_buffer(self, rows, N, fill_value):
+        # The spectrum is only reallocated when its layout changes, otherwise it is just refilled
+        if self.spectrum is None or self.spectrum.shape != (rows, N):
+            self.spectrum = np.empty((rows, N), dtype=np.float32)
+        self.spectrum.fill(fill_value)
+
     def resetPeakHold(self):
         if self.spectrum_fig_type == "Single":
-            self.peak_hold_spectrum = np.ones(self.spectrum_window_size) * -200
+            self.peak_hold_spectrum = np.full(self.spectrum_window_size, -200, dtype=np.float32)
 
     def mean_spectrum(self, measured_spec):
         def is_enabled_auto_squelch(v):
@@ -285,8 +332,11 @@ class SignalProcessor(threading.Thread):
 
     def calculate_squelch(self, sampling_freq, N, measured_spec, real_freqs):
         def find_nearest(array, value):
+            # The frequency axis is ascending, so bisect it instead of scanning every bin
             array = np.asarray(array)
-            idx = (np.abs(array - value)).argmin()
+            idx = int(np.searchsorted(array, value))
+            if idx == len(array) or (idx > 0 and value - array[idx - 1] <= array[idx] - value):
+                idx -= 1
             return idx, array[idx]
 
         self.mean_spectrum(measured_spec)
@@ -350,10 +400,23 @@ class SignalProcessor(threading.Thread):
         status["daq_num_dropped_frames"] = self.dropped_frames
 
         try:
-            with open(status_file_path, "w", encoding="utf-8") as file:
-                json.dump(status, file)
-        except Exception:
-            pass
+            # Serialize before touching the file, a failing dump must not leave an empty status file behind
+            if hasorjson:
+                payload = orjson.dumps(status, option=orjson.OPT_SERIALIZE_NUMPY)
+            else:
+                payload = json.dumps(status).encode("utf-8")
+
+            # Swap the new status in atomically, so readers never see a truncated or half written file
+            tmp_status_file_path = status_file_path + ".tmp"
+            with open(tmp_status_file_path, "wb") as file:
+                file.write(payload)
+            os.replace(tmp_status_file_path, status_file_path)
+        except Exception as e:
+            if not self.status_write_failed:
+                self.logger.error(f"Failed to write the processing status file: {e}")
+            self.status_write_failed = True
+        else:
+            self.status_write_failed = False
 
     def run(self):
         """
@@ -362,7 +425,7 @@ class SignalProcessor(threading.Thread):
         # scipy.fft.set_workers(4)
         while True:
             self.is_running = False
-            time.sleep(1)
+            self._run_processing_event.wait(1)
             while self.run_processing:
                 self.is_running = True
                 que_data_packet = []
@@ -373,7 +436,8 @@ class SignalProcessor(threading.Thread):
                 # -----> ACQUIRE NEW DATA FRAME <-----
                 get_iq_failed = self.module_receiver.get_iq_online()
 
-                start_time = time.time()
+                # Interval timing uses the monotonic high resolution clock, latency is against the wall clock
+                start_time = time.perf_counter()
                 self.save_processing_status()
 
                 que_data_packet.append(["iq_header", self.module_receiver.iq_header])
@@ -432,13 +496,7 @@ class SignalProcessor(threading.Thread):
                     if self.spectrum_fig_type == "Single":
                         m = 0
                         N = self.spectrum_window_size
-                        self.spectrum = (
-                            np.ones(
-                                (self.channel_number + (self.active_vfos * 2 + 1), N),
-                                dtype=np.float32,
-                            )
-                            * -200
-                        )  # Only 0.1 ms, not performance bottleneck
+                        self.reset_spectrum_buffer(self.channel_number + (self.active_vfos * 2 + 1), N, -200)
 
                         single_ch = self.processed_signal[self.spectrum_antenna - 1, :]
         
@@ -451,43 +509,44 @@ class SignalProcessor(threading.Thread):
                             noverlap = int(N * 0.5)
                             window = ("tukey", 0.15)
 
-                        f, Pxx_den = signal.welch(
-                            single_ch,
-                            sampling_freq,
-                            nperseg=N,
-                            nfft=N,
-                            noverlap=noverlap,  # int(N_perseg*0.0),
-                            detrend=False,
-                            return_onesided=False,
-                            window=window,
-                            # 'blackman', #('tukey', 0.25), #tukey window gives better time resolution for squelching
-                            scaling="spectrum",
-                        )
+                        with fft.set_workers(4):
+                            f, Pxx_den = signal.welch(
+                                single_ch,
+                                sampling_freq,
+                                nperseg=N,
+                                nfft=N,
+                                noverlap=noverlap,  # int(N_perseg*0.0),
+                                detrend=False,
+                                return_onesided=False,
+                                window=window,
+                                # 'blackman', #('tukey', 0.25), #tukey window gives better time resolution for squelching
+                                scaling="spectrum",
+                            )
                         self.spectrum[1 + m, :] = fft.fftshift(10 * np.log10(Pxx_den))
                         if self.en_peak_hold:
-                            self.spectrum[2 + m, :] = np.maximum(self.peak_hold_spectrum, self.spectrum[1 + m, :])
-                            self.peak_hold_spectrum = self.spectrum[2 + m, :]
+                            # The spectrum buffer is reused, so the peak hold has to keep its own copy
+                            np.maximum(self.peak_hold_spectrum, self.spectrum[1 + m, :], out=self.peak_hold_spectrum)
+                            self.spectrum[2 + m, :] = self.peak_hold_spectrum
 
                         self.spectrum[0, :] = fft.fftshift(f)
                         
                         self.socket.send(pickle.dumps(self.spectrum[1 + m, :]))
                     else:
                         N = 32768
-                        self.spectrum = np.ones(
-                            (self.channel_number + (self.active_vfos * 2 + 1), N),
-                            dtype=np.float32,
-                        )
-                        for m in range(self.channel_number):  # range(1): #range(self.channel_number):
+                        self.reset_spectrum_buffer(self.channel_number + (self.active_vfos * 2 + 1), N, 1)
+                        # All channels are transformed with a single batched, multithreaded FFT
+                        with fft.set_workers(4):
                             f, Pxx_den = signal.periodogram(
-                                self.processed_signal[m, :],
+                                self.processed_signal[: self.channel_number, :],
                                 sampling_freq,
                                 nfft=N,
                                 detrend=False,
                                 return_onesided=False,
                                 window="blackman",
                                 scaling="spectrum",
+                                axis=-1,
                             )
-                            self.spectrum[1 + m, :] = fft.fftshift(10 * np.log10(Pxx_den))
+                        self.spectrum[1 : 1 + self.channel_number, :] = fft.fftshift(10 * np.log10(Pxx_den), axes=-1)
                         self.spectrum[0, :] = fft.fftshift(f)
 
                     max_amplitude = np.max(self.spectrum[1, :])  # Max amplitude out of all 5 channels
@@ -522,6 +581,14 @@ class SignalProcessor(threading.Thread):
 
                             self.calculate_squelch(sampling_freq, N, measured_spec, real_freqs)
 
+                            # The VFO mode properties rebuild their lists on every access, resolve them once per frame
+                            vfo_demod_modes = self.vfo_demod_modes
+                            vfo_iq_enabled = self.vfo_iq_enabled
+
+                            # In Auto Max mode every VFO snaps to the same spectrum peak, search for it only once
+                            if self.vfo_mode == "Auto":
+                                auto_max_freq = self.spectrum[0, self.spectrum[1, :].argmax()]
+
                             for i in range(active_vfos):
                                 # If chanenl freq is out of bounds for the current tuned bandwidth, reset to the middle freq
                                 if abs(self.vfo_freq[i] - self.module_receiver.daq_center_freq) > sampling_freq / 2:
@@ -532,8 +599,7 @@ class SignalProcessor(threading.Thread):
                                 )  # ch_freq is relative to -sample_freq/2 : sample_freq/2, so correct for that and get the actual freq
 
                                 if self.vfo_mode == "Auto":  # Mode 1 is Auto Max Mode
-                                    max_index = self.spectrum[1, :].argmax()
-                                    freq = self.spectrum[0, max_index]
+                                    freq = auto_max_freq
                                     self.vfo_freq[i] = freq + self.module_receiver.daq_center_freq
 
                                 decimation_factor = max(
@@ -575,7 +641,7 @@ class SignalProcessor(threading.Thread):
                                 # *** HERE WE NEED TO PERFORM THE SPECTRUM UPDATE TOO ***
                                 if self.en_spectrum:
                                     # Selected Channel Window
-                                    signal_window = np.zeros(spectrum_window_size) - 120
+                                    signal_window = np.full(spectrum_window_size, -120, dtype=np.float32)
                                     signal_window[
                                         max(vfo_lower_bound, 4) : min(vfo_upper_bound, spectrum_window_size - 4)
                                     ] = 0  # max_amplitude
@@ -604,7 +670,7 @@ class SignalProcessor(threading.Thread):
                                 ):
                                     write_freq = int(self.vfo_freq[i])
                                     # Do channelization
-                                    if self.vfo_demod_modes[i] == "FM":
+                                    if vfo_demod_modes[i] == "FM":
                                         decimate_sampling_freq = 48_000
                                         decimation_factor = int(sampling_freq / decimate_sampling_freq)
 
@@ -646,23 +712,23 @@ class SignalProcessor(threading.Thread):
                                     self.freq_list.append(write_freq)
                                     self.doa_result_log_list.append(doa_result_log)
 
-                                    if self.vfo_demod_modes[i] or self.vfo_iq_enabled[i]:
+                                    if vfo_demod_modes[i] or vfo_iq_enabled[i]:
                                         if theta_0 not in self.vfo_theta_channel[i]:
                                             self.vfo_theta_channel[i].append(theta_0)
 
                                     self.vfo_time[i] += self.processed_signal[1].size / sampling_freq
                                     if 0 < self.max_demod_timeout < self.vfo_time[i] and (
-                                        self.vfo_demod_modes[i] == "FM" or self.vfo_iq_enabled[i]
+                                        vfo_demod_modes[i] == "FM" or vfo_iq_enabled[i]
                                     ):
                                         self.vfo_demod_channel[i] = np.array([])
                                         self.vfo_theta_channel[i] = []
                                         self.vfo_iq_channel[i] = np.array([])
-                                    elif self.vfo_demod_modes[i] == "FM":
+                                    elif vfo_demod_modes[i] == "FM":
                                         fm_demod_channel = fm_demod(iq_channel, decimate_sampling_freq, self.vfo_bw[i])
                                         self.vfo_demod_channel[i] = np.concatenate(
                                             (self.vfo_demod_channel[i], fm_demod_channel)
                                         )
-                                    elif self.vfo_iq_enabled[i]:
+                                    elif vfo_iq_enabled[i]:
                                         self.vfo_iq_channel[i] = np.concatenate((self.vfo_iq_channel[i], iq_channel))
                                 else:
                                     self.vfo_time[i] = 0
@@ -763,27 +829,28 @@ class SignalProcessor(threading.Thread):
                     # We don't include processing latency here, because reported timestamp marks end of the data frame
                     # so latency is essentially an acquisition time.
                     self.latency = daq_cpi
-                    self.processing_time = int(1000 * (time.time() - start_time))
+                    self.processing_time = int(1000 * (time.perf_counter() - start_time))
 
                     if self.data_ready and self.theta_0_list:
                         # Do Kraken App first as currently its the only one supporting multi-vfo out
                         if self.DOA_data_format != "Kerberos App":
-                            message = ""
+                            sub_messages = []
                             for j, freq in enumerate(self.freq_list):
                                 # KrakenSDR Android App Output
-                                sub_message = ""
-                                sub_message += f"{self.timestamp}, {360 - self.theta_0_list[j]}, {self.confidence_list[j]}, {self.max_power_level_list[j]}, "
-                                sub_message += f"{freq}, {self.DOA_ant_alignment}, {self.latency}, {self.station_id}, "
-                                sub_message += f"{self.latitude}, {self.longitude}, {self.heading}, {self.heading}, "
-                                sub_message += "GPS, R, R, R, R"  # Reserve 6 entries for other things # NOTE: Second heading is reserved for GPS heading / compass heading differentiation
-
                                 doa_result_log = self.doa_result_log_list[j] + np.abs(
                                     np.min(self.doa_result_log_list[j])
                                 )
-                                for i in range(len(doa_result_log)):
-                                    sub_message += ", " + "{:.2f}".format(doa_result_log[i])
-
-                                sub_message += " \n"
+                                # Assemble the line in one go instead of growing a string per DoA bin
+                                sub_message = "".join(
+                                    [
+                                        f"{self.timestamp}, {360 - self.theta_0_list[j]}, {self.confidence_list[j]}, {self.max_power_level_list[j]}, ",
+                                        f"{freq}, {self.DOA_ant_alignment}, {self.latency}, {self.station_id}, ",
+                                        f"{self.latitude}, {self.longitude}, {self.heading}, {self.heading}, ",
+                                        "GPS, R, R, R, R",  # Reserve 6 entries for other things # NOTE: Second heading is reserved for GPS heading / compass heading differentiation
+                                        "".join(map(DOA_VALUE_FMT, doa_result_log.tolist())),
+                                        " \n",
+                                    ]
+                                )
 
                                 if self.en_data_record:
                                     time_elapsed = (
@@ -793,10 +860,10 @@ class SignalProcessor(threading.Thread):
                                         self.last_write_time[j] = time.time()
                                         self.data_record_fd.write(sub_message)
 
-                                message += sub_message
+                                sub_messages.append(sub_message)
 
                             self.DOA_res_fd.seek(0)
-                            self.DOA_res_fd.write(message)
+                            self.DOA_res_fd.write("".join(sub_messages))
                             self.DOA_res_fd.truncate()
                         elif self.DOA_data_format == "Kerberos App":
                             self.wr_kerberos(
@@ -894,8 +961,7 @@ class SignalProcessor(threading.Thread):
                                 message = ""
                                 if doa_result_log:
                                     doa_result_log = doa_result_log + np.abs(np.min(doa_result_log))
-                                    for i in range(len(doa_result_log)):
-                                        message += ", " + "{:.2f}".format(doa_result_log[i])
+                                    message = "".join(map(DOA_VALUE_FMT, doa_result_log.tolist()))
 
                                 post = {
                                     "id": self.station_id,
@@ -929,7 +995,7 @@ class SignalProcessor(threading.Thread):
 
                 stop_time = time.time()
 
-                que_data_packet.append(["update_rate", stop_time - start_time])
+                que_data_packet.append(["update_rate", time.perf_counter() - start_time])
                 que_data_packet.append(
                     [
                         "latency",
@@ -1156,8 +1222,11 @@ class SignalProcessor(threading.Thread):
         # create a new XML file with the results
         html_str = ET.tostring(data, encoding="unicode")
 
-        with open(os.path.join(shared_path, "doa.xml"), "w+", encoding="utf-8") as file:
+        # Swap the new results in atomically, so readers never see an empty or half written file
+        tmp_xml_file_path = self.DOA_xml_file_path + ".tmp"
+        with open(tmp_xml_file_path, "w", encoding="utf-8") as file:
             file.write(html_str)
+        os.replace(tmp_xml_file_path, self.DOA_xml_file_path)
 
     def wr_kerberos(
         self,
@@ -1199,16 +1268,9 @@ class SignalProcessor(threading.Thread):
         snr_db,
     ):
         # KrakenSDR Flutter app out
-        doaString = str("")
-        for i in range(len(doa_result_log)):
-            doaString += (
-                "{:.2f}".format(doa_result_log[i] + np.abs(np.min(doa_result_log))) + ","
-            )  # TODO: After confirmed to work, optimize
-
-        # doaString = str('')
-        # doa_result_log = doa_result_log + np.abs(np.min(doa_result_log))
-        # for i in range(len(doa_result_log)):
-        #    doaString += ", " + "{:.2f}".format(doa_result_log[i])
+        # Shift the spectrum by its minimum once rather than searching for it again for every angle
+        doa_result_log = doa_result_log + np.abs(np.min(doa_result_log))
+        doaString = "".join([f"{doa_value:.2f}," for doa_value in doa_result_log.tolist()])
 
         jsonDict = {}
         jsonDict["station_id"] = station_id
@@ -1288,14 +1350,15 @@ def calc_sync(iq_samples):
 
 # Reduce spectrum size for plotting purposes by taking the MAX val every few values
 # Significantly faster with numba once we added nb.prange
-@njit(fastmath=True, cache=True)
+# Only the outermost prange is parallelized, so iterate over the many bins there instead of the few rows
+@njit(fastmath=True, cache=True, parallel=True)
 def reduce_spectrum(spectrum, spectrum_size, channel_number):
     spectrum_elements = len(spectrum[:, 0])
 
-    spectrum_plot_data = np.zeros((spectrum_elements, spectrum_size), dtype=np.float32)
+    spectrum_plot_data = np.empty((spectrum_elements, spectrum_size), dtype=np.float32)
     group = len(spectrum[0, :]) // spectrum_size
-    for m in nb.prange(spectrum_elements):
-        for i in nb.prange(spectrum_size):
+    for i in nb.prange(spectrum_size):
+        for m in range(spectrum_elements):
             spectrum_plot_data[m, i] = np.max(spectrum[m, i * group : group * (i + 1)])
     return spectrum_plot_data
 
@@ -1316,10 +1379,10 @@ def get_exponential(freq, sample_freq, sig_len):
     t = np.arange(0.0, Ts * sig_len, Ts)
     exponential = np.exp(2j * np.pi * f0 * t)  # this is essentially a complex sine wave
 
-    return np.ascontiguousarray(exponential)
+    return read_only(np.ascontiguousarray(exponential, dtype=np.complex64))
 
 
-@njit(fastmath=True, cache=True)
+@njit(fastmath=True, cache=True, nogil=True)
 def numba_mult(a, b):
     return a * b
 
@@ -1348,7 +1411,8 @@ def channelize(processed_signal, freq, decimation_factor, fir_order_factor, samp
     system = shift_filter(
         decimation_factor, fir_order_factor, freq, sampling_freq, 1.1
     )  # Decimate with a BANDPASS filter
-    decimated = signal.decimate(processed_signal, decimation_factor, ftype=system)
+    # signal.decimate always returns double precision, bring it back to the complex64 of the DAQ frames
+    decimated = signal.decimate(processed_signal, decimation_factor, ftype=system).astype(np.complex64)
     exponential = get_exponential(
         freq, sampling_freq / decimation_factor, len(decimated[0, :])
     )  # Shift the signal AFTER to get back to normal decimate behaviour
@@ -1371,7 +1435,7 @@ def channelize(processed_signal, freq, decimation_factor, fir_order_factor, samp
 
 # NUMBA optimized Thermal Noise Algorithm (TNA) function.
 # Based on `pyargus` DOA_Capon
-@njit(fastmath=True, cache=True)
+@njit(fastmath=True, cache=True, nogil=True)
 def DOA_TNA(R, scanning_vectors):
     # --> Input check
 
@@ -1408,8 +1472,8 @@ def DOA_TNA(R, scanning_vectors):
 
 
 # NUMBA optimized MUSIC function. About 100x faster on the Pi 4
-# @njit(fastmath=True, cache=True, parallel=True)
-@njit(fastmath=True, cache=True)
+# The scan over the thetas is independent per angle, so it is spread over the cores with nb.prange
+@njit(fastmath=True, cache=True, nogil=True, parallel=True)
 def DOA_MUSIC(R, scanning_vectors, signal_dimension, angle_resolution=1):
     # --> Input check
     if R[:, 0].size != R[0, :].size:
@@ -1439,12 +1503,9 @@ def DOA_MUSIC(R, scanning_vectors, signal_dimension, angle_resolution=1):
         E[:, i] = vi[:, i]
 
     E_ct = E @ E.conj().T
-    theta_index = 0
-    for i in range(scanning_vectors[0, :].size):
-        S_theta_ = scanning_vectors[:, i]
-        S_theta_ = np.ascontiguousarray(S_theta_.T)
-        ADORT[theta_index] = 1 / np.abs(S_theta_.conj().T @ E_ct @ S_theta_)
-        theta_index += 1
+    for i in nb.prange(scanning_vectors[0, :].size):
+        S_theta_ = np.ascontiguousarray(scanning_vectors[:, i])
+        ADORT[i] = 1 / np.abs(S_theta_.conj() @ E_ct @ S_theta_)
 
     return ADORT
 
@@ -1478,7 +1539,7 @@ def to_zero_to_pi(angle):
 # "Improving the resolution performance of eigenstructure-based direction-finding algorithms."
 # ICASSP'83. IEEE International Conference on Acoustics, Speech, and Signal Processing. Vol. 8. IEEE, 1983.
 # doi: 10.1109/ICASSP.1983.1172124
-@njit(fastmath=True, cache=True)
+@njit(fastmath=True, cache=True, nogil=True)
 def doa_root_music(r, signal_dimension, is_vula, inter_element_spacing, array_angle_offset):
     M = r.shape[0]
 
@@ -1549,6 +1610,12 @@ def normalized_gaussian(x, x0, sigma):
     return doa_spectrum
 
 
+# Memoized arrays are shared by every caller, flag them read-only so that none of them can modify the cached copy
+def read_only(A: np.ndarray) -> np.ndarray:
+    A.setflags(write=False)
+    return A
+
+
 def xi(uca_radius_m: float, frequency_Hz: float) -> Tuple[float, int]:
     wavelength_m = scipy.constants.speed_of_light / frequency_Hz
     x = 2.0 * np.pi * uca_radius_m / wavelength_m
@@ -1565,13 +1632,15 @@ def xi(uca_radius_m: float, frequency_Hz: float) -> Tuple[float, int]:
 def T(uca_radius_m: float, frequency_Hz: float, N: int) -> np.ndarray:
     x, L = xi(uca_radius_m, frequency_Hz)
 
+    v = np.arange(-L, L + 1)
+
     # J
-    J = np.diag([1.0 / ((1j**v) * scipy.special.jv(v, x)) for v in range(-L, L + 1, 1)])
+    J = np.diag(1.0 / ((1j**v) * scipy.special.jv(v, x)))
 
     # F
-    F = np.array([[np.exp(2.0j * np.pi * (m * n / N)) for n in range(0, N, 1)] for m in range(-L, L + 1, 1)])
+    F = np.exp(2.0j * np.pi * (np.outer(v, np.arange(N)) / N))
 
-    return (J @ F) / float(N)
+    return read_only((J @ F) / float(N))
 
 
 # The so-called "prewhitening"
@@ -1583,12 +1652,18 @@ def whiten(A: np.ndarray) -> np.ndarray:
     return A_w @ A
 
 
+# The whitened transformation only depends on the array geometry and the frequency,
+# memoize it to avoid the fractional matrix power on every frame
+@lru_cache(maxsize=32)
+def whitened_T(uca_radius_m: float, frequency_Hz: float, N: int) -> np.ndarray:
+    return read_only(whiten(T(uca_radius_m, frequency_Hz, N)))
+
+
 # @njit(fastmath=True, cache=True)
 def transform_to_phase_mode_space(signal: np.ndarray, uca_radius_m: float, frequency_Hz: float) -> np.ndarray:
-    T_ = T(uca_radius_m, frequency_Hz, signal.shape[0])
     # apparently T is not unitary and would "color" the noise in the input signal
     # thus prewhitening needs to be applied particularly to make MUSIC work
-    Tw = whiten(T_)
+    Tw = whitened_T(uca_radius_m, frequency_Hz, signal.shape[0])
     x = Tw @ signal
     return x
 
@@ -1633,11 +1708,10 @@ def fb_toeplitz_reconstruction(R: np.ndarray) -> np.ndarray:
 def gen_scanning_vectors_phase_modes_space(L, offset):
     thetas = np.deg2rad(np.linspace(0, 359, 360, dtype=float))
     M = np.arange(-L, L + 1, dtype=float)
-    scanning_vectors = np.zeros((M.size, thetas.size), dtype=np.complex64)
-    for i in range(thetas.size):
-        scanning_vectors[:, i] = np.exp(1.0j * M * (thetas[i] + offset))
+    # Broadcast the phase modes against the thetas instead of filling the columns one by one
+    scanning_vectors = np.exp(1.0j * np.outer(M, thetas + offset)).astype(np.complex64)
 
-    return np.ascontiguousarray(scanning_vectors)
+    return read_only(np.ascontiguousarray(scanning_vectors))
 
 
 # LRU cache memoize about 1000x faster.
@@ -1656,49 +1730,34 @@ def gen_scanning_vectors(M, DOA_inter_elem_space, type, offset):
         x = np.zeros(M)
         y = -np.arange(M) * DOA_inter_elem_space
 
-    scanning_vectors = np.zeros((M, thetas.size), dtype=np.complex64)
-    for i in range(thetas.size):
-        scanning_vectors[:, i] = np.exp(
-            1j * 2 * np.pi * (x * np.cos(np.deg2rad(thetas[i] + offset)) + y * np.sin(np.deg2rad(thetas[i] + offset)))
-        )
+    # Broadcast the element positions against the thetas instead of filling the columns one by one
+    thetas_rad = np.deg2rad(thetas + offset)
+    scanning_vectors = np.exp(
+        1j * 2 * np.pi * (np.outer(x, np.cos(thetas_rad)) + np.outer(y, np.sin(thetas_rad)))
+    ).astype(np.complex64)
 
-    return np.ascontiguousarray(scanning_vectors)
+    return read_only(np.ascontiguousarray(scanning_vectors))
 
 
 # @lru_cache(maxsize=32)
-@njit(fastmath=True, cache=True)
 def gen_scanning_vectors_custom(M, custom_x, custom_y):
     thetas = np.linspace(
         0, 359, 360
     )  # Remember to change self.DOA_thetas too, we didn't include that in this function due to memoization cannot work with arrays
 
+    # Elements without a given position stay at the origin
     x = np.zeros(M, dtype=np.float32)
     y = np.zeros(M, dtype=np.float32)
+    x[: min(M, len(custom_x))] = custom_x[:M]
+    y[: min(M, len(custom_y))] = custom_y[:M]
 
-    for i in range(len(custom_x)):
-        if i > M:
-            break
-        if custom_x[i] == "":
-            x[i] = 0
-        else:
-            x[i] = float(custom_x[i])
-
-    for i in range(len(custom_y)):
-        if i > M:
-            break
-        if custom_x[i] == "":
-            y[i] = 0
-        else:
-            y[i] = float(custom_y[i])
+    # Broadcast the element positions against the thetas instead of filling the columns one by one
+    thetas_rad = np.deg2rad(thetas)
+    scanning_vectors = np.exp(
+        1j * 2 * np.pi * (np.outer(x, np.cos(thetas_rad)) + np.outer(y, np.sin(thetas_rad)))
+    ).astype(np.complex64)
 
-    scanning_vectors = np.zeros((M, thetas.size), dtype=np.complex64)
-    complex_pi = 1j * 2 * np.pi
-    for i in range(thetas.size):
-        scanning_vectors[:, i] = np.exp(
-            complex_pi * (x * np.cos(np.deg2rad(thetas[i])) + y * np.sin(np.deg2rad(thetas[i])))
-        )
-
-    return np.ascontiguousarray(scanning_vectors)
+    return read_only(np.ascontiguousarray(scanning_vectors))
 
 
 @njit(fastmath=True, cache=True)
@@ -1710,23 +1769,28 @@ def DOA_plot_util(DOA_data, log_scale_min=-100):
     - Changes to log scale
     """
     # Normalization
-    max_doa_amplitude = np.max(np.abs(DOA_data))
-    DOA_data = (np.abs(DOA_data) / max_doa_amplitude) if max_doa_amplitude > NEAR_ZERO else np.abs(DOA_data)
-
-    # Change to logscale
-    DOA_data = 10 * np.log10(DOA_data)
+    doa_amplitudes = np.abs(DOA_data)
+    max_doa_amplitude = np.max(doa_amplitudes)
+    norm = max_doa_amplitude if max_doa_amplitude > NEAR_ZERO else 1.0
 
-    for i in range(len(DOA_data)):  # Remove extremely low values
-        if DOA_data[i] < log_scale_min:
-            DOA_data[i] = log_scale_min
+    # Change to logscale and remove extremely low values in the same pass
+    for i in range(len(doa_amplitudes)):
+        doa_amplitudes[i] = max(10 * np.log10(doa_amplitudes[i] / norm), log_scale_min)
 
-    return DOA_data
+    return doa_amplitudes
 
 
+# Peak and mean amplitude are gathered in a single pass, without temporary arrays
 @njit(fastmath=True, cache=True)
 def calculate_doa_papr(DOA_data):
-    mean_doa_amplitude = np.mean(np.abs(DOA_data))
-    return 10 * np.log10(np.max(np.abs(DOA_data)) / mean_doa_amplitude) if mean_doa_amplitude > NEAR_ZERO else 0.0
+    sum_doa_amplitude = 0.0
+    max_doa_amplitude = 0.0
+    for i in range(len(DOA_data)):
+        doa_amplitude = np.abs(DOA_data[i])
+        sum_doa_amplitude += doa_amplitude
+        max_doa_amplitude = max(max_doa_amplitude, doa_amplitude)
+    mean_doa_amplitude = sum_doa_amplitude / len(DOA_data)
+    return 10 * np.log10(max_doa_amplitude / mean_doa_amplitude) if mean_doa_amplitude > NEAR_ZERO else 0.0
 
 
 # test commit
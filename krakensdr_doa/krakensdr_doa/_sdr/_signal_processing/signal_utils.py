@@ -49,14 +49,13 @@ def audio_agc(samples, sample_freq, t_max):
     t_slice = int(t_max * sample_freq)
     demod_channel = samples
 
-    new_demod_channel = None
+    # Rescaled time-slices are written into a preallocated output instead of growing it chunk by chunk
+    new_demod_channel = np.empty(demod_channel.size, dtype=np.int16)
     demod_channel_chunks = np.array_split(demod_channel, math.ceil(demod_channel.size / t_slice))
+    chunk_start = 0
     for chunk in demod_channel_chunks:
-        aud_chunk = audible(chunk)
-        if new_demod_channel is not None:
-            new_demod_channel = np.concatenate((new_demod_channel, aud_chunk))
-        else:
-            new_demod_channel = aud_chunk
+        new_demod_channel[chunk_start : chunk_start + chunk.size] = audible(chunk)
+        chunk_start += chunk.size
 
     return audible(new_demod_channel)
 
@@ -0,0 +1,51 @@
+"""
+Unit test for the settings file serialization of the web interface
+"""
+import io
+import math
+import sys
+import unittest
+from os.path import dirname, join, realpath
+from unittest import mock
+
+import numpy as np
+
+current_path = dirname(realpath(__file__))
+root_path = dirname(current_path)
+sys.path.insert(0, join(root_path, "_ui", "_web_interface"))
+
+import settings_file  # noqa: E402
+
+
+class TestSettingsFile(unittest.TestCase):
+    def _round_trip(self, data):
+        return settings_file.load_settings(io.StringIO(settings_file.dumps_settings(data).decode()))
+
+    def _check_round_trip(self):
+        data = {"center_freq": np.float64(416.588), "squelch_threshold_dB": math.nan, 1: "int key", "max": math.inf}
+        loaded = self._round_trip(data)
+
+        self.assertAlmostEqual(loaded["center_freq"], 416.588)
+        self.assertTrue(math.isnan(loaded["squelch_threshold_dB"]))
+        self.assertEqual(loaded["max"], math.inf)
+        self.assertEqual(loaded["1"], "int key")
+
+    def test_round_trip(self):
+        self._check_round_trip()
+
+    def test_round_trip_without_orjson(self):
+        with mock.patch.object(settings_file, "hasorjson", False):
+            self._check_round_trip()
+
+    def test_finite_settings_round_trip(self):
+        data = {"vfo_freq": [np.int64(416588000), 416.5], 2: {"nested": np.float32(0.5)}}
+        self.assertEqual(self._round_trip(data), {"vfo_freq": [416588000, 416.5], "2": {"nested": 0.5}})
+
+    def test_load_legacy_non_finite_literals(self):
+        loaded = settings_file.load_settings(io.StringIO('{"a": NaN, "b": -Infinity}'))
+        self.assertTrue(math.isnan(loaded["a"]))
+        self.assertEqual(loaded["b"], -math.inf)
+
+
+if __name__ == "__main__":
+    unittest.main()
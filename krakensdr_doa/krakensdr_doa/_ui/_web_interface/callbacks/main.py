@@ -41,6 +41,14 @@ from variables import (
     trace_colors,
 )
 
+# Make orjson an optional component, /get_angle is polled by external clients
+try:
+    import orjson
+
+    hasorjson = True
+except ModuleNotFoundError:
+    hasorjson = False
+
 
 # ============================================
 #          CALLBACK FUNCTIONS
@@ -1352,10 +1360,16 @@ def callback_array_offset(offset):
 def get_angle():
     try:
         
-        return json.dumps({"aoa": str(((360 - web_interface.doas[0] + web_interface.compass_offset) % 360)),
+        angle = {"aoa": str(((360 - web_interface.doas[0] + web_interface.compass_offset) % 360)),
             "max_amplitude" : "{:.1f}".format(web_interface.max_amplitude),
-            "polar": web_interface.doa_results[0].tolist(),
-            "thetas" : ((360 - web_interface.doa_thetas + web_interface.compass_offset) % 360).tolist()}) 
+            "polar": web_interface.doa_results[0],
+            "thetas" : (360 - web_interface.doa_thetas + web_interface.compass_offset) % 360}
+        if hasorjson:
+            # Serializes the numpy arrays directly, without boxing every element into a Python float
+            return orjson.dumps(angle, option=orjson.OPT_SERIALIZE_NUMPY)
+        angle["polar"] = angle["polar"].tolist()
+        angle["thetas"] = angle["thetas"].tolist()
+        return json.dumps(angle)
     except Exception as error:
         return str(error)
     # return str(angle) + "," + str(max_power)+ ',' + str(web_interface.doa_results)
@@ -1,3 +1,4 @@
+import io
 from configparser import ConfigParser
 
 import dash_html_components as html
@@ -63,8 +64,17 @@ def write_config_file_dict(web_interface, param_dict, dsp_settings):
             web_interface.logger.error(e)
         return -1, error_list
     else:
+        config_buffer = io.StringIO()
+        parser.write(config_buffer)
+        content = config_buffer.getvalue()
+
+        # Leave an unchanged config file untouched, this saves a write on the SD card of the host
+        with open(daq_config_filename, "r") as configfile:
+            if configfile.read() == content:
+                return 0, []
+
         with open(daq_config_filename, "w") as configfile:
-            parser.write(configfile)
+            configfile.write(content)
         return 0, []
 
 
@@ -1,7 +1,5 @@
-import json
 import logging
 import queue
-import time
 
 import numpy as np
 
@@ -21,9 +19,25 @@ from kraken_sdr_receiver import ReceiverRTLSDR
 
 # Import built-in modules
 from kraken_sdr_signal_processor import SignalProcessor
+from settings_file import dumps_settings
 from utils import read_config_file_dict, settings_change_watcher
 
 
+def write_settings_file(data):
+    content = dumps_settings(data)
+
+    # Skip rewriting an unchanged file, every write bumps the mtime and makes the settings watchers reload it
+    try:
+        with open(settings_file_path, "rb") as infile:
+            if infile.read() == content:
+                return
+    except OSError:
+        pass
+
+    with open(settings_file_path, "wb") as outfile:
+        outfile.write(content)
+
+
 class WebInterface:
     def __init__(self):
         self.user_interface = None
@@ -350,8 +364,7 @@ class WebInterface:
 
         data["ext_upd_flag"] = False
 
-        with open(settings_file_path, "w") as outfile:
-            json.dump(data, outfile, indent=2)
+        write_settings_file(data)
 
     def load_default_configuration(self):
         data = {}
@@ -431,8 +444,7 @@ class WebInterface:
 
         data["ext_upd_flag"] = True
 
-        with open(settings_file_path, "w") as outfile:
-            json.dump(data, outfile, indent=2)
+        write_settings_file(data)
 
     def start_processing(self):
         """
@@ -450,9 +462,8 @@ class WebInterface:
 
     def stop_processing(self):
         self.module_signal_processor.run_processing = False
-        while self.module_signal_processor.is_running:
-            # Block until signal processor run_processing while loop ends
-            time.sleep(0.01)
+        # Block until signal processor run_processing while loop ends
+        self.module_signal_processor.wait_until_idle()
 
     def close_data_interfaces(self):
         self.module_receiver.eth_close()
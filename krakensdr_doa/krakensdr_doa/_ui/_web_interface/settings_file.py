@@ -0,0 +1,64 @@
+import json
+import math
+
+import numpy as np
+
+# Make orjson an optional component, it serializes numpy scalars natively
+try:
+    import orjson
+
+    hasorjson = True
+except ModuleNotFoundError:
+    hasorjson = False
+
+
+def _numpy_default(obj):
+    if isinstance(obj, (np.generic, np.ndarray)):
+        return obj.tolist()
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+
+def _has_non_finite(data):
+    if isinstance(data, dict):
+        return any(_has_non_finite(value) for value in data.values())
+    if isinstance(data, (list, tuple)):
+        return any(_has_non_finite(value) for value in data)
+    if isinstance(data, (float, np.floating)):
+        return not math.isfinite(data)
+    if isinstance(data, np.ndarray) and data.dtype.kind in "fc":
+        return not np.isfinite(data).all()
+    return False
+
+
+def dumps_settings(data):
+    """
+    Serialize the settings dictionary to the bytes of the settings file.
+
+    orjson writes NaN and Infinity as null, so such settings are written by the json module to be read back unchanged
+    """
+    if hasorjson and not _has_non_finite(data):
+        try:
+            return orjson.dumps(
+                data, option=orjson.OPT_INDENT_2 | orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS
+            )
+        except orjson.JSONEncodeError:
+            pass
+
+    return json.dumps(data, indent=2, default=_numpy_default).encode()
+
+
+def load_settings(file):
+    """
+    Parse the settings file.
+
+    orjson is tried first, it rejects the NaN and Infinity literals that the json module writes,
+    so such files (also the ones written by older versions) are parsed by the json module instead
+    """
+    content = file.read()
+    if hasorjson:
+        try:
+            return orjson.loads(content)
+        except orjson.JSONDecodeError:
+            pass
+
+    return json.loads(content)
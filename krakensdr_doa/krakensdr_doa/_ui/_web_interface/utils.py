@@ -1,5 +1,4 @@
 import copy
-import json
 import os
 import queue
 from configparser import ConfigParser
@@ -11,6 +10,7 @@ import variables
 from kraken_sdr_signal_processor import DEFAULT_VFO_FIR_ORDER_FACTOR
 from kraken_web_doa import plot_doa
 from kraken_web_spectrum import plot_spectrum
+from settings_file import load_settings
 from variables import (
     AGC_WARNING_DISABLED_STYLE,
     AGC_WARNING_ENABLED_STYLE,
@@ -251,9 +251,9 @@ def settings_change_watcher(web_interface, settings_file_path, last_attempt_fail
             # Load settings file
             try:
                 with open(settings_file_path, "r", encoding="utf-8") as file:
-                    dsp_settings = json.load(file)
-                    if dsp_settings is None:
-                        raise RuntimeError("%s appears empty" % file)
+                    dsp_settings = load_settings(file)
+                if dsp_settings is None:
+                    raise RuntimeError("%s appears empty" % settings_file_path)
             except Exception as ex:
                 if not last_attempt_failed:
                     web_interface.logger.error("Problem loading settings file: %s", ex)